@@ -0,0 +1,113 @@
+"""
+OpenAI Batch API support for the vector store.
+Embeds uncached texts with Batch API jobs (half the price of regular requests,
+results can take up to 24 hours) before pages are added.
+"""
+
+from typing import Dict, List
+import time
+import orjson
+
+
+class BatchApiMixin:
+    """
+    Batch API methods of VectorStore. They use its OpenAI client, model settings
+    and embedding caches (_truncate, _text_key, _embedding_cache, persistent_cache),
+    and leave results in _prefetched for _embed_batch().
+    """
+
+    # OpenAI Batch API limits per job (requests and input file size)
+    BATCH_API_MAX_REQUESTS = 50000
+    BATCH_API_MAX_FILE_BYTES = 190 * 1024 * 1024
+
+    def _prefetch_with_batch_api(self, texts: List[str], poll_interval: int):
+        """
+        Embed texts that are not cached yet with OpenAI Batch API jobs and wait for
+        the results. They are kept for _embed_batch() and in the persistent cache.
+
+        Args:
+            texts: Texts to embed
+            poll_interval: Seconds between job status checks
+        """
+        misses = {}
+        for text in texts:
+            text = self._truncate(text)
+            key = self._text_key(text)
+            if key not in self._embedding_cache:
+                misses[key] = text
+        if misses and self.persistent_cache is not None:
+            for key in self.persistent_cache.get_cached_embeddings(list(misses)):
+                del misses[key]
+        if not misses:
+            return
+
+        print(f"Embedding {len(misses)} texts with the OpenAI Batch API...")
+        for job_lines in self._batch_api_files(misses):
+            embeddings = self._run_batch_job(job_lines, poll_interval)
+            self._prefetched.update(embeddings)
+            if self.persistent_cache is not None:
+                self.persistent_cache.save_embeddings(embeddings)
+
+        missing = len(misses) - len(self._prefetched)
+        if missing > 0:
+            print(f"  ⚠️  {missing} texts were not embedded by the Batch API, using regular requests")
+
+    def _batch_api_files(self, texts: Dict[str, str]):
+        """Split key -> text into Batch API input files (lists of JSONL lines) within the job limits"""
+        lines = []
+        size = 0
+        for key, text in texts.items():
+            line = orjson.dumps({
+                'custom_id': key,
+                'method': 'POST',
+                'url': '/v1/embeddings',
+                'body': {'model': self.embedding_model, 'input': text, **self._embedding_args}
+            }) + b'\n'
+            if lines and (len(lines) >= self.BATCH_API_MAX_REQUESTS
+                          or size + len(line) > self.BATCH_API_MAX_FILE_BYTES):
+                yield lines
+                lines = []
+                size = 0
+            lines.append(line)
+            size += len(line)
+        if lines:
+            yield lines
+
+    def _run_batch_job(self, lines: List[bytes], poll_interval: int) -> Dict[str, List[float]]:
+        """
+        Run one Batch API job and wait until it finishes.
+
+        Returns:
+            Dictionary key (custom_id) -> embedding for requests that succeeded
+        """
+        try:
+            input_file = self.openai_client.files.create(
+                file=('embeddings.jsonl', b''.join(lines)),
+                purpose='batch'
+            )
+            job = self.openai_client.batches.create(
+                input_file_id=input_file.id,
+                endpoint='/v1/embeddings',
+                completion_window='24h'
+            )
+            print(f"  Batch job {job.id}: {len(lines)} requests submitted")
+
+            while job.status not in ('completed', 'failed', 'expired', 'cancelled'):
+                time.sleep(poll_interval)
+                job = self.openai_client.batches.retrieve(job.id)
+            print(f"  Batch job {job.id}: {job.status}")
+
+            # Expired and cancelled jobs still return the requests that finished
+            embeddings = {}
+            if job.output_file_id:
+                output = self.openai_client.files.content(job.output_file_id)
+                for line in output.text.splitlines():
+                    record = orjson.loads(line)
+                    response = record.get('response') or {}
+                    if response.get('status_code') == 200:
+                        embeddings[record['custom_id']] = response['body']['data'][0]['embedding']
+            return embeddings
+
+        except Exception as e:
+            print(f"  ⚠️  Batch API job failed ({e})")
+            return {}
@@ -3,7 +3,10 @@ Configuration settings for web crawler.
 All settings are loaded from environment variables (.env file).
 """
 
+import functools
+import multiprocessing
 import os
+import re
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -32,8 +35,13 @@ BASE_URL = os.getenv('BASE_URL', 'https://wiki.gcore.lu/')
 MAX_PAGES = get_int('MAX_PAGES', 50)
 DELAY = get_int('DELAY', 2)
 STEALTH_MODE = get_bool('STEALTH_MODE', True)
+MAX_WORKERS = get_int('MAX_WORKERS', 8)
+PARSE_WORKERS = get_int('PARSE_WORKERS', 0)
+MAX_PAGE_BYTES = get_int('MAX_PAGE_BYTES', 5 * 1024 * 1024)
+DATABASE_ENABLED = get_bool('DATABASE_ENABLED', False)
 DATABASE_PATH = os.getenv('DATABASE_PATH', 'crawl_data.db')
-OUTPUT_FILE = os.getenv('OUTPUT_FILE', 'crawl_results.json')
+INCREMENTAL_CRAWL = get_bool('INCREMENTAL_CRAWL', True)
+OUTPUT_FILE = os.getenv('OUTPUT_FILE', 'crawl_results.ndjson')
 
 
 # =============================================================================
@@ -42,9 +50,21 @@ OUTPUT_FILE = os.getenv('OUTPUT_FILE', 'crawl_results.json')
 VECTOR_STORE_ENABLED = get_bool('VECTOR_STORE_ENABLED', True)
 VECTOR_STORE_PATH = os.getenv('VECTOR_STORE_PATH', './chroma_db')
 VECTOR_COLLECTION_NAME = os.getenv('VECTOR_COLLECTION_NAME', 'crawled_pages')
+# HNSW index tuning (0 = ChromaDB default: M=16, ef_construction=100, ef_search=100).
+# M and ef_construction only apply to new collections
+HNSW_M = get_int('HNSW_M', 0)
+HNSW_EF_CONSTRUCTION = get_int('HNSW_EF_CONSTRUCTION', 0)
+HNSW_EF_SEARCH = get_int('HNSW_EF_SEARCH', 0)
+# Keep page text in ChromaDB too (false: text only in SQLite, no duplicate storage)
+VECTOR_STORE_DOCUMENTS = get_bool('VECTOR_STORE_DOCUMENTS', True)
 
 # OpenAI Embeddings API settings
 OPENAI_EMBEDDING_MODEL = os.getenv('OPENAI_EMBEDDING_MODEL', 'text-embedding-3-small')
+# Shorter text-embedding-3 vectors (0 = model default, e.g. 512 or 256)
+OPENAI_EMBEDDING_DIMENSIONS = get_int('OPENAI_EMBEDDING_DIMENSIONS', 0)
+# Embed crawled pages with the Batch API (half price, results within 24h)
+OPENAI_BATCH_API = get_bool('OPENAI_BATCH_API', False)
+OPENAI_BATCH_POLL_INTERVAL = get_int('OPENAI_BATCH_POLL_INTERVAL', 60)
 # Alternative OpenAI models:
 # - 'text-embedding-3-large' (3072-dim, $0.13/1M tokens, better quality)
 # - 'text-embedding-ada-002' (1536-dim, $0.10/1M tokens, legacy model)
@@ -56,6 +76,17 @@ OPENAI_EMBEDDING_MODEL = os.getenv('OPENAI_EMBEDDING_MODEL', 'text-embedding-3-s
 # =============================================================================
 # AUTHENTICATION CONFIGURATION
 # =============================================================================
+# Separator of AUTH_COOKIES entries (KEY1=VALUE1;KEY2=VALUE2)
+_COOKIE_SEP_RE = re.compile(r'\s*;\s*')
+
+
+def _parse_cookies(cookies_str):
+    """Parse KEY1=VALUE1;KEY2=VALUE2 into a dict"""
+    return dict(
+        cookie.split('=', 1) for cookie in _COOKIE_SEP_RE.split(cookies_str.strip()) if '=' in cookie
+    )
+
+
 def _build_auth_config():
     """
     Build authentication configuration from environment variables.
@@ -74,15 +105,9 @@ def _build_auth_config():
         if not cookies_str:
             return None
 
-        cookies = {}
-        for cookie in cookies_str.split(';'):
-            if '=' in cookie:
-                key, value = cookie.strip().split('=', 1)
-                cookies[key] = value
-
         return {
             'type': 'cookies',
-            'cookies': cookies
+            'cookies': _parse_cookies(cookies_str)
         }
 
     elif auth_type == 'auto_cookies':
@@ -100,13 +125,7 @@ def _build_auth_config():
         password_field = os.getenv('AUTH_LOGIN_PASSWORD_FIELD', 'password')
 
         # Optional: Parse initial cookies if provided
-        initial_cookies_str = os.getenv('AUTH_COOKIES', '')
-        initial_cookies = {}
-        if initial_cookies_str:
-            for cookie in initial_cookies_str.split(';'):
-                if '=' in cookie:
-                    key, value = cookie.strip().split('=', 1)
-                    initial_cookies[key] = value
+        initial_cookies = _parse_cookies(os.getenv('AUTH_COOKIES', ''))
 
         return {
             'type': 'auto_cookies',
@@ -149,12 +168,29 @@ def _build_auth_config():
         return None
 
 
-AUTH_CONFIG = _build_auth_config()
+@functools.lru_cache(maxsize=1)
+def get_auth_config():
+    """
+    Authentication configuration, built on first use.
+
+    Returns:
+        dict or None: Authentication configuration based on AUTH_TYPE
+    """
+    return _build_auth_config()
+
+
+def __getattr__(name):
+    # config.AUTH_CONFIG is built lazily, so parse worker processes that import
+    # the package never parse cookies or print auth warnings
+    if name == 'AUTH_CONFIG':
+        return get_auth_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # =============================================================================
 # CONFIGURATION VALIDATION
 # =============================================================================
+@functools.lru_cache(maxsize=1)
 def validate_config():
     """
     Validate configuration settings.
@@ -169,12 +205,36 @@ def validate_config():
         warnings.append("⚠️  OPENAI_API_KEY is not set! Vector store will not work.")
         warnings.append("   Get your key at: https://platform.openai.com/api-keys")
 
+    if VECTOR_STORE_ENABLED and not VECTOR_STORE_DOCUMENTS and not DATABASE_ENABLED:
+        warnings.append("⚠️  VECTOR_STORE_DOCUMENTS is false but DATABASE_ENABLED is false:")
+        warnings.append("   page text is stored nowhere, search results will have no preview")
+
     if MAX_PAGES < 1:
         warnings.append(f"⚠️  MAX_PAGES is {MAX_PAGES}, should be >= 1")
 
     if DELAY < 0:
         warnings.append(f"⚠️  DELAY is {DELAY}, should be >= 0")
 
+    if MAX_WORKERS < 1:
+        warnings.append(f"⚠️  MAX_WORKERS is {MAX_WORKERS}, should be >= 1")
+
+    if OPENAI_EMBEDDING_DIMENSIONS < 0:
+        warnings.append(f"⚠️  OPENAI_EMBEDDING_DIMENSIONS is {OPENAI_EMBEDDING_DIMENSIONS}, should be >= 0")
+
+    for name, value in (('HNSW_M', HNSW_M), ('HNSW_EF_CONSTRUCTION', HNSW_EF_CONSTRUCTION),
+                        ('HNSW_EF_SEARCH', HNSW_EF_SEARCH)):
+        if value < 0:
+            warnings.append(f"⚠️  {name} is {value}, should be >= 0")
+
+    if OPENAI_BATCH_API and OPENAI_BATCH_POLL_INTERVAL < 1:
+        warnings.append(f"⚠️  OPENAI_BATCH_POLL_INTERVAL is {OPENAI_BATCH_POLL_INTERVAL}, should be >= 1")
+
+    if PARSE_WORKERS < 0:
+        warnings.append(f"⚠️  PARSE_WORKERS is {PARSE_WORKERS}, should be >= 0")
+
+    if MAX_PAGE_BYTES < 1:
+        warnings.append(f"⚠️  MAX_PAGE_BYTES is {MAX_PAGE_BYTES}, should be >= 1")
+
     if warnings:
         print("\n" + "=" * 80)
         print("CONFIGURATION WARNINGS")
@@ -196,21 +256,35 @@ def print_config():
     print(f"MAX_PAGES: {MAX_PAGES}")
     print(f"DELAY: {DELAY}")
     print(f"STEALTH_MODE: {STEALTH_MODE}")
+    print(f"MAX_WORKERS: {MAX_WORKERS}")
+    print(f"PARSE_WORKERS: {PARSE_WORKERS}")
+    print(f"MAX_PAGE_BYTES: {MAX_PAGE_BYTES}")
+    print(f"DATABASE_ENABLED: {DATABASE_ENABLED}")
     print(f"DATABASE_PATH: {DATABASE_PATH}")
+    print(f"INCREMENTAL_CRAWL: {INCREMENTAL_CRAWL}")
     print(f"OUTPUT_FILE: {OUTPUT_FILE}")
     print(f"VECTOR_STORE_ENABLED: {VECTOR_STORE_ENABLED}")
     print(f"VECTOR_STORE_PATH: {VECTOR_STORE_PATH}")
     print(f"VECTOR_COLLECTION_NAME: {VECTOR_COLLECTION_NAME}")
+    print(f"VECTOR_STORE_DOCUMENTS: {VECTOR_STORE_DOCUMENTS}")
+    print(f"HNSW_M / EF_CONSTRUCTION / EF_SEARCH: "
+          f"{HNSW_M or 'default'} / {HNSW_EF_CONSTRUCTION or 'default'} / {HNSW_EF_SEARCH or 'default'}")
     print(f"OPENAI_EMBEDDING_MODEL: {OPENAI_EMBEDDING_MODEL}")
+    print(f"OPENAI_EMBEDDING_DIMENSIONS: {OPENAI_EMBEDDING_DIMENSIONS or 'model default'}")
+    print(f"OPENAI_BATCH_API: {OPENAI_BATCH_API}")
+    print(f"OPENAI_BATCH_POLL_INTERVAL: {OPENAI_BATCH_POLL_INTERVAL}")
     print(f"OPENAI_API_KEY: {'✓ Set' if os.getenv('OPENAI_API_KEY') else '✗ Not set'}")
 
-    if AUTH_CONFIG:
-        print(f"AUTH_CONFIG: {AUTH_CONFIG.get('type', 'unknown')}")
+    auth_config = get_auth_config()
+    if auth_config:
+        print(f"AUTH_CONFIG: {auth_config.get('type', 'unknown')}")
     else:
         print("AUTH_CONFIG: None")
 
     print("=" * 80 + "\n")
 
 
-# Validate configuration on import
-validate_config()
+# Validate configuration on import (only once, in the main process: parse worker
+# processes import the package again)
+if multiprocessing.current_process().name == 'MainProcess':
+    validate_config()
@@ -4,15 +4,52 @@ Implements web crawling with stealth mode and authentication support.
 """
 
 import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
+from urllib3.util.retry import Retry
+import orjson
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from html import unescape
+import re
+import threading
 import time
-import json
+import logging
+import logging.handlers
+import multiprocessing
 import random
+import sys
+
+from .parsing import (cached_parse_url, extract_links, header_charset, is_crawlable_url,
+                      parse_page, site_origin, url_id)
+
+
+logger = logging.getLogger(__name__)
+
+# Compression codecs urllib3 can decode here (br needs brotli installed);
+# never advertise one we could not decompress
+_ACCEPT_ENCODING = ', '.join(make_headers(accept_encoding=True)['accept-encoding'].split(','))
+
+# CSRF <input> fields on login pages (scanned with regex, no DOM needed)
+_CSRF_FIELDS = ('atl_token', 'csrf_token', '_csrf', 'authenticity_token')
+_CSRF_NAMES = rb'(atl_token|csrf_token|_csrf|authenticity_token)'
+_CSRF_NAME_FIRST_RE = re.compile(
+    rb'<input\b[^>]*?\bname\s*=\s*["\']' + _CSRF_NAMES + rb'["\'][^>]*?\bvalue\s*=\s*["\']([^"\']+)["\']',
+    re.IGNORECASE)
+_CSRF_VALUE_FIRST_RE = re.compile(
+    rb'<input\b[^>]*?\bvalue\s*=\s*["\']([^"\']+)["\'][^>]*?\bname\s*=\s*["\']' + _CSRF_NAMES + rb'["\']',
+    re.IGNORECASE)
 
 
 class WebCrawler:
-    def __init__(self, base_url, max_pages=100, delay=1, stealth_mode=False, auth=None):
+    _HTML_CONTENT_TYPES = frozenset(('text/html', 'application/xhtml+xml'))
+
+    # Number of page text characters stored per result
+    TEXT_PREVIEW_CHARS = 1000
+
+    def __init__(self, base_url, max_pages=100, delay=1, stealth_mode=False, auth=None, max_workers=8,
+                 output_file=None, max_page_bytes=5 * 1024 * 1024, known_pages=None,
+                 parse_workers=0):
         """
         Initialize web crawler
 
@@ -25,18 +62,59 @@ class WebCrawler:
                   {'type': 'basic', 'username': 'user', 'password': 'pass'}
                   or
                   {'type': 'cookies', 'cookies': {'session': 'token'}}
+            max_workers: Number of pages fetched concurrently (request starts are spaced
+                         delay / max_workers apart, so the overall rate stays bounded)
+            output_file: If set, results are streamed to this file as NDJSON (one record
+                         per line) while crawling instead of being kept in memory
+            max_page_bytes: Pages with a larger (decompressed) body are skipped
+            known_pages: Pages from a previous crawl, url -> {'title', 'text_length',
+                         'etag', 'last_modified', 'links', 'content_sha256'} (see
+                         CrawlDatabase.get_crawl_state). They are requested with
+                         conditional GET. Pages that answer 304 or whose text hash is
+                         unchanged are still reported, flagged 'unchanged': True
+                         (304 records have 'text': None, the text is in the database)
+            parse_workers: Number of processes that parse pages (0 = parse in the fetch
+                           threads). Helps on multi-core machines when parsing, not
+                           the network, limits the crawl. Workers are spawned, so the
+                           calling script needs an `if __name__ == "__main__":` guard
         """
         self.base_url = base_url
         self.max_pages = max_pages
         self.delay = delay
         self.stealth_mode = stealth_mode
-        self.visited_urls = set()
-        self.to_visit = [base_url]
+        self.visited_urls = set()  # url_id() fingerprints of URLs already taken for crawling
+        self.to_visit = deque([base_url])  # FIFO frontier (O(1) popleft)
+        self._queued = {base_url}  # URLs currently waiting in to_visit (O(1) membership)
         self.results = []
+        self.results_count = 0
+        self.not_modified_count = 0
+        self.unchanged_count = 0
+        self.refreshed_validators = {}  # url -> (etag, last_modified, links) of unchanged pages
+        self.known_pages = known_pages or {}
+        self.output_file = output_file
+        self._results_fh = None
         self.auth = auth
+        self.max_workers = max(1, max_workers)
+        self.max_page_bytes = max_page_bytes
+        self.parse_workers = max(0, parse_workers)
+        self._parse_pool = None
+
+        self._setup_logging()
+
+        # Locks for shared crawl state (workers run in threads)
+        self._lock = threading.Lock()
+        self._auth_lock = threading.Lock()
+        self._auth_generation = 0  # Incremented by each successful re-login
+
+        # Shared pacer: earliest time the next request may start
+        self._pace_lock = threading.Lock()
+        self._next_request_at = 0.0
 
         # Create session to preserve cookies
         self.session = requests.Session()
+        self.session.headers.setdefault('Connection', 'keep-alive')
+        self.session.headers['Accept-Encoding'] = _ACCEPT_ENCODING
+        self._setup_connection_pool()
 
         # Configure stealth mode
         if stealth_mode:
@@ -47,8 +125,54 @@ class WebCrawler:
             self._setup_auth(auth)
 
         # Get domain to ensure we stay on same site
-        parsed = urlparse(base_url)
-        self.domain = f"{parsed.scheme}://{parsed.netloc}"
+        self.domain = site_origin(base_url)
+        self._domain_prefix = self.domain + '/'
+
+        self._flush_logs()
+
+    def _setup_logging(self):
+        """Send crawler messages to stdout through a buffered handler (once per process)"""
+        # Leave output alone if the application already configured logging
+        if logger.handlers or logging.getLogger().handlers:
+            return
+
+        # Buffer up to 100 records per write; errors are written immediately
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(logging.handlers.MemoryHandler(capacity=100, target=stream_handler))
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+    def _flush_logs(self):
+        """Write out buffered log messages"""
+        for handler in logger.handlers:
+            handler.flush()
+
+    def _setup_connection_pool(self):
+        """Mount an HTTP adapter with a large keep-alive pool and retries"""
+        # Default pool keeps only 10 connections per host; workers beyond that
+        # would open and discard connections instead of reusing them
+        retries = Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[500, 502, 503, 504],
+            allowed_methods=['GET', 'POST']
+        )
+        adapter = HTTPAdapter(
+            pool_connections=32,
+            pool_maxsize=max(64, self.max_workers),
+            max_retries=retries
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _warm_up_connection(self):
+        """Open a pooled connection (DNS + TCP + TLS) to the crawl domain before crawling"""
+        try:
+            self.session.head(self.domain, timeout=5)
+        except requests.RequestException:
+            # Not fatal: the first page request will simply pay the handshake
+            pass
 
     def _setup_stealth_mode(self):
         """Configure stealth mode for undetectable crawling"""
@@ -73,7 +197,7 @@ class WebCrawler:
             'User-Agent': random.choice(user_agents),
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
             'Accept-Language': 'en-US,en;q=0.9,ru;q=0.8',
-            'Accept-Encoding': 'gzip, deflate, br',
+            'Accept-Encoding': _ACCEPT_ENCODING,
             'DNT': '1',
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
@@ -84,9 +208,9 @@ class WebCrawler:
             'Cache-Control': 'max-age=0'
         })
 
-        print(f"✓ Stealth mode activated")
-        print(f"  User-Agent: {self.session.headers['User-Agent'][:80]}...")
-        print(f"  Random delay: {self.delay}-{self.delay * 3} sec")
+        logger.info(f"✓ Stealth mode activated")
+        logger.info(f"  User-Agent: {self.session.headers['User-Agent'][:80]}...")
+        logger.info(f"  Random delay: {self.delay}-{self.delay * 3} sec")
 
     def _setup_auth(self, auth):
         """Configure authentication"""
@@ -96,12 +220,12 @@ class WebCrawler:
             # HTTP Basic Authentication
             from requests.auth import HTTPBasicAuth
             self.session.auth = HTTPBasicAuth(auth['username'], auth['password'])
-            print("✓ Basic Auth configured")
+            logger.info("✓ Basic Auth configured")
 
         elif auth_type == 'cookies':
             # Cookie-based authentication
             self.session.cookies.update(auth['cookies'])
-            print("✓ Cookies added")
+            logger.info("✓ Cookies added")
 
         elif auth_type == 'auto_cookies':
             # Auto-refresh cookie authentication
@@ -115,18 +239,18 @@ class WebCrawler:
             # Use initial cookies if provided
             if auth.get('initial_cookies'):
                 self.session.cookies.update(auth['initial_cookies'])
-                print("✓ Auto-refresh cookies configured (using initial cookies)")
+                logger.info("✓ Auto-refresh cookies configured (using initial cookies)")
             else:
                 # Perform initial login
                 if self._login():
-                    print("✓ Auto-refresh cookies configured (logged in successfully)")
+                    logger.info("✓ Auto-refresh cookies configured (logged in successfully)")
                 else:
-                    print("⚠️  Initial login failed - will retry on first request")
+                    logger.warning("⚠️  Initial login failed - will retry on first request")
 
         elif auth_type == 'headers':
             # Header-based authentication (e.g., Bearer token)
             self.session.headers.update(auth['headers'])
-            print("✓ Authentication headers added")
+            logger.info("✓ Authentication headers added")
 
     def _get_random_delay(self):
         """Return random delay for stealth mode"""
@@ -148,7 +272,7 @@ class WebCrawler:
             return False
 
         try:
-            print(f"🔐 Logging in to {self.login_url}...")
+            logger.info(f"🔐 Logging in to {self.login_url}...")
 
             # Step 1: GET login page to fetch CSRF token and establish session
             get_response = self.session.get(
@@ -160,16 +284,21 @@ class WebCrawler:
             # Extract CSRF token from HTML (Confluence uses atl_token or csrf_token)
             csrf_token = None
             try:
-                soup = BeautifulSoup(get_response.text, 'html.parser')
+                # Collect candidate <input> fields (name/value in either attribute order)
+                found = {}
+                for match in _CSRF_NAME_FIRST_RE.finditer(get_response.content):
+                    found.setdefault(match.group(1).decode(), match.group(2))
+                for match in _CSRF_VALUE_FIRST_RE.finditer(get_response.content):
+                    found.setdefault(match.group(2).decode(), match.group(1))
+
                 # Try common CSRF token field names
-                for field_name in ['atl_token', 'csrf_token', '_csrf', 'authenticity_token']:
-                    csrf_field = soup.find('input', {'name': field_name})
-                    if csrf_field and csrf_field.get('value'):
-                        csrf_token = csrf_field.get('value')
-                        print(f"  Found CSRF token: {field_name}")
+                for field_name in _CSRF_FIELDS:
+                    if found.get(field_name):
+                        csrf_token = unescape(found[field_name].decode('utf-8', 'ignore'))
+                        logger.info(f"  Found CSRF token: {field_name}")
                         break
             except Exception as e:
-                print(f"  ⚠️  Could not parse CSRF token: {e}")
+                logger.warning(f"  ⚠️  Could not parse CSRF token: {e}")
 
             # Step 2: Prepare login data
             login_data = {
@@ -186,7 +315,7 @@ class WebCrawler:
             login_headers = {
                 'Content-Type': 'application/x-www-form-urlencoded',
                 'Referer': self.login_url,
-                'Origin': f"{urlparse(self.login_url).scheme}://{urlparse(self.login_url).netloc}"
+                'Origin': f"{cached_parse_url(self.login_url).scheme}://{cached_parse_url(self.login_url).netloc}"
             }
 
             response = self.session.post(
@@ -202,22 +331,22 @@ class WebCrawler:
             if response.status_code in [200, 302, 303]:
                 # Check if we got cookies
                 if len(self.session.cookies) > 0:
-                    print(f"✓ Login successful! Got {len(self.session.cookies)} cookies")
+                    logger.info(f"✓ Login successful! Got {len(self.session.cookies)} cookies")
                     # Print cookie names (not values for security)
                     cookie_names = ', '.join(self.session.cookies.keys())
-                    print(f"  Cookies: {cookie_names}")
+                    logger.info(f"  Cookies: {cookie_names}")
                     return True
                 else:
-                    print("⚠️  Login returned success but no cookies received")
+                    logger.warning("⚠️  Login returned success but no cookies received")
                     return False
             else:
-                print(f"✗ Login failed with status code {response.status_code}")
+                logger.error(f"✗ Login failed with status code {response.status_code}")
                 # Print response snippet for debugging
-                print(f"  Response preview: {response.text[:200]}")
+                logger.info(f"  Response preview: {response.text[:200]}")
                 return False
 
         except Exception as e:
-            print(f"✗ Login error: {str(e)}")
+            logger.error(f"✗ Login error: {str(e)}")
             return False
 
     def _is_auth_expired(self, response):
@@ -247,42 +376,33 @@ class WebCrawler:
 
         return False
 
+    def _read_capped(self, response):
+        """Read response body up to max_page_bytes; returns None if the page is larger"""
+        content_length = response.headers.get('Content-Length', '')
+        if content_length.isdigit() and int(content_length) > self.max_page_bytes:
+            return None
+
+        buffer = bytearray()
+        for chunk in response.iter_content(chunk_size=65536):
+            buffer.extend(chunk)
+            if len(buffer) > self.max_page_bytes:
+                return None
+        return bytes(buffer)
+
+    def _is_html_response(self, response):
+        """Check Content-Type header (missing header is treated as HTML)"""
+        content_type = response.headers.get('Content-Type', '')
+        if not content_type:
+            return True
+        return content_type.split(';')[0].strip().lower() in self._HTML_CONTENT_TYPES
+
     def is_valid_url(self, url):
         """Check if URL is valid and belongs to same domain"""
-        parsed = urlparse(url)
-
-        # Check if it's HTTP/HTTPS
-        if parsed.scheme not in ['http', 'https']:
-            return False
-
-        # Check if it's the same domain
-        url_domain = f"{parsed.scheme}://{parsed.netloc}"
-        if url_domain != self.domain:
-            return False
-
-        # Ignore binary files
-        excluded_extensions = ['.pdf', '.jpg', '.jpeg', '.png', '.gif', '.zip', '.rar', '.doc', '.docx', '.xls', '.xlsx']
-        if any(url.lower().endswith(ext) for ext in excluded_extensions):
-            return False
+        return is_crawlable_url(url, self.domain, self._domain_prefix)
 
-        return True
-
-    def extract_links(self, soup, current_url):
-        """Extract all links from page"""
-        links = []
-        for link in soup.find_all('a', href=True):
-            href = link['href']
-
-            # Convert relative links to absolute
-            full_url = urljoin(current_url, href)
-
-            # Remove fragments (#)
-            full_url = full_url.split('#')[0]
-
-            if self.is_valid_url(full_url):
-                links.append(full_url)
-
-        return links
+    def extract_links(self, tree, current_url):
+        """Extract all links from parsed page (each link once, in page order)"""
+        return extract_links(tree, current_url, self.domain)
 
     def crawl_page(self, url, retry_count=0):
         """
@@ -296,89 +416,257 @@ class WebCrawler:
             bool: True on success, False on failure
         """
         try:
-            print(f"Processing: {url}")
-            response = self.session.get(url, timeout=10)
-
-            # Check if authentication has expired
-            if self._is_auth_expired(response) and retry_count == 0:
-                print(f"⚠️  Authentication expired for {url}")
-
-                # Try to refresh cookies by logging in again
-                if hasattr(self, 'login_url') and self._login():
-                    print(f"🔄 Retrying {url} with fresh cookies...")
-                    # Retry the request once with new cookies
-                    return self.crawl_page(url, retry_count=1)
-                else:
-                    print(f"✗ Could not refresh authentication")
-                    return False
-
-            response.raise_for_status()
+            logger.info(f"Processing: {url}")
+            auth_generation = self._auth_generation
+            # Stream so headers can be checked before the body is downloaded
+            with self.session.get(url, timeout=10, stream=True,
+                                  headers=self._conditional_headers(url)) as response:
+                # Check if authentication has expired
+                if self._is_auth_expired(response) and retry_count == 0:
+                    logger.warning(f"⚠️  Authentication expired for {url}")
+
+                    # Try to refresh cookies by logging in again (one worker at a time;
+                    # workers whose request predates another worker's login just retry)
+                    with self._auth_lock:
+                        if self._auth_generation != auth_generation:
+                            refreshed = True
+                        else:
+                            refreshed = hasattr(self, 'login_url') and self._login()
+                            if refreshed:
+                                self._auth_generation += 1
+                    if refreshed:
+                        logger.info(f"🔄 Retrying {url} with fresh cookies...")
+                        # Retry the request once with new cookies
+                        return self.crawl_page(url, retry_count=1)
+                    else:
+                        logger.error(f"✗ Could not refresh authentication")
+                        return False
+
+                # Unchanged since the last crawl: no body to download or parse
+                if response.status_code == 304:
+                    logger.info(f"✓ Not modified: {url}")
+                    known = self.known_pages[url]
+                    record = {
+                        'url': url,
+                        'title': known.get('title') or '',
+                        'text': None,  # Not downloaded; stored in the database
+                        'text_length': known.get('text_length') or 0,
+                        'etag': known.get('etag'),
+                        'last_modified': known.get('last_modified'),
+                        'links': known['links'],
+                        'content_sha256': known.get('content_sha256'),
+                        'unchanged': True
+                    }
+                    with self._lock:
+                        self.not_modified_count += 1
+                    self._add_result(record)
+                    return True
 
-            soup = BeautifulSoup(response.content, 'html.parser')
+                response.raise_for_status()
 
-            # Extract text
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
+                # Skip binary/media URLs without a telltale extension (e.g. /download?id=)
+                if not self._is_html_response(response):
+                    logger.info(f"Skipping non-HTML content: {url}")
+                    return False
 
-            text = soup.get_text()
-            # Clean text from extra whitespace
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = '\n'.join(chunk for chunk in chunks if chunk)
+                # Read the body in chunks and give up on oversized pages
+                content = self._read_capped(response)
+                if content is None:
+                    logger.warning(f"⚠️  Skipping page larger than {self.max_page_bytes} bytes: {url}")
+                    return False
 
-            # Save result
-            self.results.append({
-                'url': url,
-                'title': soup.title.string if soup.title else '',
-                'text': text[:1000],  # First 1000 characters
-                'text_length': len(text)
-            })
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+                encoding = header_charset(response.headers.get('Content-Type'))
 
-            # Extract links for further crawling
-            links = self.extract_links(soup, url)
+            # Parse (CPU-bound): in a worker process when a parse pool is running
+            parse_args = (content, url, self.domain, self.TEXT_PREVIEW_CHARS, encoding)
+            if self._parse_pool:
+                page = self._parse_pool.submit(parse_page, *parse_args).result()
+            else:
+                page = parse_page(*parse_args)
+            links = page['links']
 
-            # Add new links to queue
-            for link in links:
-                if link not in self.visited_urls and link not in self.to_visit:
-                    self.to_visit.append(link)
+            record = {
+                'url': url,
+                'title': page['title'],
+                'text': page['text'],
+                'text_length': page['text_length'],
+                'etag': etag,
+                'last_modified': last_modified,
+                'links': links,
+                'content_sha256': page['content_sha256']
+            }
 
+            # Identical content is flagged, so it is not saved to the database again
+            known = self.known_pages.get(url)
+            if known and known.get('content_sha256') == page['content_sha256']:
+                logger.info(f"✓ Content unchanged: {url}")
+                record['unchanged'] = True
+                with self._lock:
+                    self.unchanged_count += 1
+                    # Keep validators current so the next crawl can get a 304, and
+                    # links too: the hash covers only the text, and a 304 re-queues
+                    # the stored links
+                    if ((etag, last_modified, links)
+                            != (known.get('etag'), known.get('last_modified'), known['links'])):
+                        self.refreshed_validators[url] = (etag, last_modified, links)
+
+            self._add_result(record)
             return True
 
         except Exception as e:
-            print(f"Error processing {url}: {str(e)}")
+            logger.error(f"Error processing {url}: {str(e)}")
             return False
 
-    def crawl(self):
-        """Main crawling method"""
-        print(f"Starting crawl: {self.base_url}")
-        print(f"Maximum pages: {self.max_pages}")
-        print("-" * 80)
-
-        while self.to_visit and len(self.visited_urls) < self.max_pages:
-            url = self.to_visit.pop(0)
-
-            if url in self.visited_urls:
-                continue
-
-            self.visited_urls.add(url)
-            self.crawl_page(url)
+    def _add_result(self, record):
+        """Save a page record (streamed to disk when output_file is set) and queue its links"""
+        with self._lock:
+            if self._results_fh:
+                self._results_fh.write(orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE).decode())
+            else:
+                self.results.append(record)
+            self.results_count += 1
 
-            # Delay between requests (random in stealth mode)
-            delay = self._get_random_delay()
+            # Add new links to queue
+            self._enqueue_links(record['links'])
+
+    def _conditional_headers(self, url):
+        """Build If-None-Match / If-Modified-Since headers for a page seen in a previous crawl"""
+        known = self.known_pages.get(url)
+        if not known:
+            return None
+
+        headers = {}
+        if known.get('etag'):
+            headers['If-None-Match'] = known['etag']
+        if known.get('last_modified'):
+            headers['If-Modified-Since'] = known['last_modified']
+        return headers or None
+
+    def _enqueue_links(self, links):
+        """Add unseen links to the frontier (caller must hold _lock)"""
+        for link in links:
+            if link not in self._queued and url_id(link) not in self.visited_urls:
+                self.to_visit.append(link)
+                self._queued.add(link)
+
+    def _wait_for_turn(self):
+        """
+        Space request starts across all workers (token bucket with one token).
+        Each start reserves delay / max_workers seconds, so N workers together
+        keep roughly the same request rate as N independent delayed loops,
+        without bursts of simultaneous requests.
+        """
+        delay = self._get_random_delay() / self.max_workers
+        with self._pace_lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_request_at)
+            self._next_request_at = start_at + delay
+        if start_at > now:
             if self.stealth_mode:
-                print(f"⏳ Pause {delay:.1f} sec...")
-            time.sleep(delay)
+                logger.info(f"⏳ Pause {start_at - now:.1f} sec...")
+            time.sleep(start_at - now)
+
+    def _crawl_worker(self, url):
+        """Wait for the shared pacer, then crawl one page in a worker thread"""
+        self._wait_for_turn()
+        self.crawl_page(url)
+
+    def _next_batch(self, limit=None):
+        """Pop up to limit (default max_workers) unvisited URLs from the queue and mark them visited"""
+        if limit is None:
+            limit = self.max_workers
+        batch = []
+        with self._lock:
+            while (self.to_visit and len(batch) < limit
+                   and len(self.visited_urls) < self.max_pages):
+                url = self.to_visit.popleft()
+                self._queued.discard(url)
+
+                fingerprint = url_id(url)
+                if fingerprint in self.visited_urls:
+                    continue
+
+                self.visited_urls.add(fingerprint)
+                batch.append(url)
+        return batch
+
+    def crawl(self):
+        """Main crawling method (fetches up to max_workers pages concurrently)"""
+        logger.info(f"Starting crawl: {self.base_url}")
+        logger.info(f"Maximum pages: {self.max_pages}")
+        logger.info(f"Concurrent workers: {self.max_workers}")
+        logger.info("-" * 80)
+
+        # Line-buffered so partial results survive a crash
+        if self.output_file and not self._results_fh:
+            self._results_fh = open(self.output_file, 'w', encoding='utf-8', buffering=1)
+
+        self._warm_up_connection()
+
+        # CPU-bound parsing runs outside the GIL in worker processes; 'spawn' avoids
+        # forking a process that already has running threads
+        if self.parse_workers:
+            logger.info(f"Parse processes: {self.parse_workers}")
+            self._parse_pool = ProcessPoolExecutor(
+                max_workers=self.parse_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
 
-        print("-" * 80)
-        print(f"Crawl completed!")
-        print(f"Pages processed: {len(self.visited_urls)}")
-        print(f"Results collected: {len(self.results)}")
+        # Network-bound work: overlap request round-trips across worker threads
+        # Keep max_workers pages in flight, refilling as each one finishes
+        # (no waiting for the slowest page of a wave)
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                in_flight = set()
+                while True:
+                    for url in self._next_batch(self.max_workers - len(in_flight)):
+                        in_flight.add(executor.submit(self._crawl_worker, url))
+                    if not in_flight:
+                        break
 
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+        finally:
+            if self._parse_pool:
+                self._parse_pool.shutdown()
+                self._parse_pool = None
+
+        logger.info("-" * 80)
+        logger.info(f"Crawl completed!")
+        logger.info(f"Pages processed: {len(self.visited_urls)}")
+        logger.info(f"Results collected: {self.results_count}")
+        if self.known_pages:
+            logger.info(f"Not modified since last crawl: {self.not_modified_count}")
+            logger.info(f"Content unchanged since last crawl: {self.unchanged_count}")
+        self._flush_logs()
+
+        # Empty when results were streamed to output_file (use load_results)
         return self.results
 
     def save_results(self, filename='crawl_results.json'):
-        """Save results to JSON file"""
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(self.results, f, ensure_ascii=False, indent=2)
-        print(f"Results saved to {filename}")
+        """
+        Save results to JSON file.
+        When streaming to output_file, flushes and closes the NDJSON file instead.
+        """
+        if self._results_fh:
+            self._results_fh.close()
+            self._results_fh = None
+            logger.info(f"Results saved to {self.output_file}")
+            self._flush_logs()
+            return
+
+        with open(filename, 'wb') as f:
+            f.write(orjson.dumps(self.results, option=orjson.OPT_INDENT_2))
+        logger.info(f"Results saved to {filename}")
+        self._flush_logs()
+
+    @staticmethod
+    def load_results(filename):
+        """Lazily yield result records from an NDJSON results file"""
+        with open(filename, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield orjson.loads(line)
@@ -4,26 +4,84 @@ Handles SQLite storage and retrieval of crawled pages.
 """
 
 import sqlite3
-import json
+import numpy as np
+import orjson
+import zstandard
 from datetime import datetime
 
 
 class CrawlDatabase:
     """Class for working with SQLite database"""
 
-    def __init__(self, db_path='crawl_data.db'):
+    # Upsert keeps the row id stable, so the full-text index is updated in place
+    _SQL_INSERT_PAGE = '''
+        INSERT INTO pages
+        (url, title, content, text_length, links_count, metadata, crawled_at,
+         etag, last_modified, links, content_sha256)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(url) DO UPDATE SET
+            title = excluded.title,
+            content = excluded.content,
+            text_length = excluded.text_length,
+            links_count = excluded.links_count,
+            metadata = excluded.metadata,
+            crawled_at = excluded.crawled_at,
+            etag = excluded.etag,
+            last_modified = excluded.last_modified,
+            links = excluded.links,
+            content_sha256 = excluded.content_sha256
+    '''
+
+    # Columns read by get_page() / get_pages()
+    _PAGE_COLUMNS = 'url, title, content, text_length, links_count, crawled_at, metadata'
+
+    # Columns added after the original schema (table -> name -> type), created on open
+    _EXTRA_COLUMNS = {
+        'pages': {
+            'etag': 'TEXT',           # HTTP validators for conditional re-crawls
+            'last_modified': 'TEXT',
+            'links': 'TEXT',          # JSON list of outgoing links (followed on 304)
+            'content_sha256': 'TEXT', # Hash of page text (unchanged pages are not re-saved)
+        },
+        'embeddings': {
+            'scale': 'REAL',          # int8 quantization scale (NULL: float32 vector)
+        },
+    }
+
+    def __init__(self, db_path='crawl_data.db', auto_commit=False):
         """
         Initialize database connection
 
         Args:
             db_path: Path to SQLite database file
+            auto_commit: Commit after every save_page() call. When False (default),
+                         writes are grouped until commit(), save_pages_batch() or close()
         """
         self.db_path = db_path
+        self.auto_commit = auto_commit
         self.conn = sqlite3.connect(db_path)
         self.cursor = self.conn.cursor()
+
+        # Page text is stored zstd-compressed (content column)
+        self._compressor = zstandard.ZstdCompressor(level=3)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+        self._configure_connection()
         self._create_tables()
         print(f"✓ Database connected: {db_path}")
 
+    def _configure_connection(self):
+        """Tune SQLite for write-heavy crawling"""
+        # WAL + NORMAL sync: commits append to the log instead of fsyncing the main file
+        self.cursor.execute('PRAGMA journal_mode=WAL')
+        self.cursor.execute('PRAGMA synchronous=NORMAL')
+        self.cursor.execute('PRAGMA temp_store=MEMORY')
+        self.cursor.execute('PRAGMA cache_size=-65536')  # 64 MB page cache
+        self.cursor.execute('PRAGMA mmap_size=268435456')  # Read through a 256 MB memory map
+
+        # SQL access to compressed text (used by the full-text index)
+        self.conn.create_function('zstd_text', 1, self._decompress_text, deterministic=True)
+
     def _create_tables(self):
         """Create tables if they don't exist"""
         self.cursor.execute('''
@@ -31,7 +89,7 @@ class CrawlDatabase:
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 url TEXT UNIQUE NOT NULL,
                 title TEXT,
-                content TEXT,
+                content BLOB,
                 text_length INTEGER,
                 links_count INTEGER,
                 crawled_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -39,24 +97,118 @@ class CrawlDatabase:
             )
         ''')
 
-        # Create indexes for fast lookups
+        # Create indexes for fast lookups (url is already indexed by its UNIQUE
+        # constraint; drop the duplicate index older databases were created with)
+        self.cursor.execute('DROP INDEX IF EXISTS idx_url')
         self.cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_url ON pages(url)
+            CREATE INDEX IF NOT EXISTS idx_crawled_at ON pages(crawled_at)
         ''')
+
+        self._create_fts_index()
+
+        # Embedding vectors by text hash, reused across runs by VectorStore
         self.cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_crawled_at ON pages(crawled_at)
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                scale REAL
+            ) WITHOUT ROWID
         ''')
 
+        self._add_missing_columns()
+
         self.conn.commit()
 
+    def _add_missing_columns(self):
+        """Upgrade databases created with an older schema"""
+        for table, columns in self._EXTRA_COLUMNS.items():
+            self.cursor.execute(f'PRAGMA table_info({table})')
+            existing = {row[1] for row in self.cursor.fetchall()}
+            for name, column_type in columns.items():
+                if name not in existing:
+                    self.cursor.execute(f'ALTER TABLE {table} ADD COLUMN {name} {column_type}')
+
+    def _create_fts_index(self):
+        """Create FTS5 full-text index over pages (kept in sync by triggers)"""
+        self.cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'pages_fts'"
+        )
+        row = self.cursor.fetchone()
+        fts_exists = row is not None and 'pages_text' in row[0]
+
+        if not fts_exists:
+            # Older index read plain text straight from pages; replace it
+            for trigger in ('pages_fts_insert', 'pages_fts_delete', 'pages_fts_update'):
+                self.cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+            self.cursor.execute('DROP TABLE IF EXISTS pages_fts')
+
+            # Compress text stored before compression was introduced
+            self.cursor.execute("SELECT id, content FROM pages WHERE typeof(content) = 'text'")
+            rows = [(self._compress_text(content), page_id)
+                    for page_id, content in self.cursor.fetchall()]
+            self.cursor.executemany('UPDATE pages SET content = ? WHERE id = ?', rows)
+
+        # The index reads decompressed text through this view
+        self.cursor.execute('''
+            CREATE VIEW IF NOT EXISTS pages_text AS
+            SELECT id, title, zstd_text(content) AS content FROM pages
+        ''')
+
+        # External-content table: indexes title/content without storing a copy
+        self.cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS pages_fts USING fts5(
+                title, content,
+                content='pages_text', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        ''')
+        self.cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS pages_fts_insert AFTER INSERT ON pages BEGIN
+                INSERT INTO pages_fts(rowid, title, content)
+                VALUES (new.id, new.title, zstd_text(new.content));
+            END
+        ''')
+        self.cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS pages_fts_delete AFTER DELETE ON pages BEGIN
+                INSERT INTO pages_fts(pages_fts, rowid, title, content)
+                VALUES ('delete', old.id, old.title, zstd_text(old.content));
+            END
+        ''')
+        self.cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS pages_fts_update AFTER UPDATE ON pages BEGIN
+                INSERT INTO pages_fts(pages_fts, rowid, title, content)
+                VALUES ('delete', old.id, old.title, zstd_text(old.content));
+                INSERT INTO pages_fts(rowid, title, content)
+                VALUES (new.id, new.title, zstd_text(new.content));
+            END
+        ''')
+
+        # Index pages stored before the full-text index existed
+        if not fts_exists:
+            self.cursor.execute("INSERT INTO pages_fts(pages_fts) VALUES ('rebuild')")
+
+    def _compress_text(self, text):
+        """Compress page text for the content column"""
+        if text is None:
+            return None
+        return self._compressor.compress(text.encode('utf-8'))
+
+    def _decompress_text(self, value):
+        """Decompress a content value (plain text from old rows is returned as is)"""
+        if value is None or isinstance(value, str):
+            return value
+        return self._decompressor.decompress(value).decode('utf-8')
+
     def page_exists(self, url):
         """Check if page exists in database"""
-        self.cursor.execute('SELECT id FROM pages WHERE url = ?', (url,))
+        self.cursor.execute('SELECT 1 FROM pages WHERE url = ? LIMIT 1', (url,))
         return self.cursor.fetchone() is not None
 
-    def save_page(self, url, title, content, links_count=0, metadata=None):
+    def save_page(self, url, title, content, links_count=0, metadata=None,
+                  etag=None, last_modified=None, links=None, content_sha256=None,
+                  text_length=None):
         """
-        Save page to database
+        Save page to database (committed immediately only if auto_commit is set)
 
         Args:
             url: Page URL
@@ -64,42 +216,203 @@ class CrawlDatabase:
             content: Full page text
             links_count: Number of links on page
             metadata: Additional metadata (dictionary)
+            etag: ETag response header (for conditional re-crawls)
+            last_modified: Last-Modified response header
+            links: List of outgoing links found on the page
+            content_sha256: SHA-256 of the page text (for change detection)
+            text_length: Length of the full page text when content is only a preview
+                         (defaults to len(content))
         """
         try:
-            text_length = len(content)
-            metadata_json = json.dumps(metadata) if metadata else None
-
-            self.cursor.execute('''
-                INSERT OR REPLACE INTO pages
-                (url, title, content, text_length, links_count, metadata, crawled_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (url, title, content, text_length, links_count, metadata_json, datetime.now()))
+            self.cursor.execute(self._SQL_INSERT_PAGE,
+                                self._page_row(url, title, content, links_count, metadata,
+                                               etag, last_modified, links, content_sha256,
+                                               text_length))
 
-            self.conn.commit()
+            if self.auto_commit:
+                self.conn.commit()
             return True
         except Exception as e:
             print(f"Database save error: {e}")
             return False
 
+    def save_pages_batch(self, pages):
+        """
+        Save many pages in a single transaction
+
+        Args:
+            pages: List of dictionaries with keys: url, title, content and optionally
+                   links_count, metadata, etag, last_modified, links, content_sha256,
+                   text_length (see save_page)
+
+        Returns:
+            Number of pages saved
+        """
+        if not pages:
+            return 0
+
+        try:
+            rows = [
+                self._page_row(page['url'], page.get('title', ''), page.get('content', ''),
+                               page.get('links_count', 0), page.get('metadata'),
+                               page.get('etag'), page.get('last_modified'), page.get('links'),
+                               page.get('content_sha256'), page.get('text_length'))
+                for page in pages
+            ]
+            self.cursor.executemany(self._SQL_INSERT_PAGE, rows)
+            self.conn.commit()
+            return len(rows)
+        except Exception as e:
+            self.conn.rollback()
+            print(f"Database batch save error: {e}")
+            return 0
+
+    def _page_row(self, url, title, content, links_count, metadata,
+                  etag=None, last_modified=None, links=None, content_sha256=None,
+                  text_length=None):
+        """Build an insert row for the pages table"""
+        metadata_json = orjson.dumps(metadata, option=orjson.OPT_NON_STR_KEYS).decode() if metadata else None
+        links_json = orjson.dumps(links).decode() if links is not None else None
+        if text_length is None:
+            text_length = len(content)
+        return (url, title, self._compress_text(content), text_length, links_count,
+                metadata_json, datetime.now(),
+                etag, last_modified, links_json, content_sha256)
+
+    def update_validators(self, validators):
+        """
+        Store new ETag / Last-Modified values and links for pages whose text did not change
+
+        Args:
+            validators: Dictionary url -> (etag, last_modified, links)
+        """
+        if not validators:
+            return
+        self.cursor.executemany(
+            'UPDATE pages SET etag = ?, last_modified = ?, links = ?, links_count = ? WHERE url = ?',
+            [(etag, last_modified, orjson.dumps(links).decode(), len(links), url)
+             for url, (etag, last_modified, links) in validators.items()]
+        )
+        self.conn.commit()
+
+    def get_cached_embeddings(self, keys):
+        """
+        Look up stored embedding vectors
+
+        Args:
+            keys: Cache keys (text hashes) to look up
+
+        Returns:
+            Dictionary key -> embedding (list of floats) for keys that were found
+        """
+        found = {}
+        # Stay below SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            self.cursor.execute(
+                f'SELECT key, vector, scale FROM embeddings WHERE key IN ({placeholders})', chunk
+            )
+            for key, vector, scale in self.cursor.fetchall():
+                if scale is None:
+                    found[key] = np.frombuffer(vector, dtype=np.float32).tolist()
+                else:
+                    found[key] = (np.frombuffer(vector, dtype=np.int8).astype(np.float32)
+                                  * np.float32(scale)).tolist()
+        return found
+
+    def save_embeddings(self, embeddings):
+        """
+        Store embedding vectors for reuse by later runs.
+        Vectors are quantized to int8 with one scale per vector (4x smaller than
+        float32; cosine similarity changes by well under 1%).
+
+        Args:
+            embeddings: Dictionary key -> embedding (list of floats)
+        """
+        if not embeddings:
+            return
+        self.cursor.executemany(
+            'INSERT OR REPLACE INTO embeddings (key, vector, scale) VALUES (?, ?, ?)',
+            [(key, *self._quantize(vector)) for key, vector in embeddings.items()]
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def _quantize(vector):
+        """Symmetric int8 quantization: returns (int8 bytes, scale)"""
+        vector = np.asarray(vector, dtype=np.float32)
+        scale = float(np.abs(vector).max()) / 127 or 1.0
+        quantized = np.round(vector / scale).astype(np.int8)
+        return quantized.tobytes(), scale
+
+    def get_crawl_state(self):
+        """
+        Get validators and content hashes of stored pages so a re-crawl can
+        skip unchanged pages
+
+        Returns:
+            Dictionary url -> {'title', 'text_length', 'etag', 'last_modified',
+            'links', 'content_sha256'}
+        """
+        self.cursor.execute('''
+            SELECT url, title, text_length, etag, last_modified, links, content_sha256 FROM pages
+            WHERE etag IS NOT NULL OR last_modified IS NOT NULL OR content_sha256 IS NOT NULL
+        ''')
+        return {
+            url: {
+                'title': title,
+                'text_length': text_length,
+                'etag': etag,
+                'last_modified': last_modified,
+                'links': orjson.loads(links) if links else [],
+                'content_sha256': content_sha256
+            }
+            for url, title, text_length, etag, last_modified, links, content_sha256
+            in self.cursor.fetchall()
+        }
+
+    def commit(self):
+        """Commit pending writes"""
+        self.conn.commit()
+
     def get_page(self, url):
         """Get page by URL"""
-        self.cursor.execute('''
-            SELECT url, title, content, text_length, links_count, crawled_at, metadata
-            FROM pages WHERE url = ?
-        ''', (url,))
+        self.cursor.execute(f'SELECT {self._PAGE_COLUMNS} FROM pages WHERE url = ?', (url,))
 
         row = self.cursor.fetchone()
-        if row:
-            return {
-                'url': row[0],
-                'title': row[1],
-                'content': row[2],
-                'text_length': row[3],
-                'links_count': row[4],
-                'crawled_at': row[5],
-                'metadata': json.loads(row[6]) if row[6] else None
-            }
-        return None
+        return self._page_from_row(row) if row else None
+
+    def get_pages(self, urls):
+        """
+        Get several pages by URL in one query
+
+        Args:
+            urls: Page URLs to load
+
+        Returns:
+            Dictionary url -> page (same fields as get_page) for URLs that were found
+        """
+        if not urls:
+            return {}
+        # One JSON array parameter keeps the statement the same for any number of URLs
+        self.cursor.execute(
+            f'SELECT {self._PAGE_COLUMNS} FROM pages WHERE url IN (SELECT value FROM json_each(?))',
+            (orjson.dumps(list(urls)).decode(),)
+        )
+        return {row[0]: self._page_from_row(row) for row in self.cursor.fetchall()}
+
+    def _page_from_row(self, row):
+        """Convert a row selected with _PAGE_COLUMNS to a page dictionary"""
+        return {
+            'url': row[0],
+            'title': row[1],
+            'content': self._decompress_text(row[2]),
+            'text_length': row[3],
+            'links_count': row[4],
+            'crawled_at': row[5],
+            'metadata': orjson.loads(row[6]) if row[6] else None
+        }
 
     def get_all_pages(self, limit=None):
         """Get all pages from database"""
@@ -110,17 +423,42 @@ class CrawlDatabase:
         self.cursor.execute(query)
         return self.cursor.fetchall()
 
-    def search_pages(self, search_term):
-        """Search pages by keyword in title or content"""
-        self.cursor.execute('''
-            SELECT url, title, text_length, crawled_at
-            FROM pages
-            WHERE title LIKE ? OR content LIKE ?
-            ORDER BY crawled_at DESC
-        ''', (f'%{search_term}%', f'%{search_term}%'))
+    def search_pages(self, search_term, limit=100, with_scores=False):
+        """
+        Search pages by keywords in title or content (FTS5, best matches first)
+
+        Args:
+            search_term: Words to search for (all words must match)
+            limit: Maximum number of results
+            with_scores: Append the BM25 relevance score to each row
+                         (lower is more relevant)
+
+        Returns:
+            List of (url, title, text_length, crawled_at) tuples ranked by BM25,
+            or (url, title, text_length, crawled_at, score) with with_scores
+        """
+        query = self._fts_query(search_term)
+        if not query:
+            return []
+
+        score_column = ', bm25(pages_fts)' if with_scores else ''
+        self.cursor.execute(f'''
+            SELECT p.url, p.title, p.text_length, p.crawled_at{score_column}
+            FROM pages_fts f
+            JOIN pages p ON p.id = f.rowid
+            WHERE pages_fts MATCH ?
+            ORDER BY bm25(pages_fts)
+            LIMIT ?
+        ''', (query, limit))
 
         return self.cursor.fetchall()
 
+    @staticmethod
+    def _fts_query(search_term):
+        """Quote each word so user input is never parsed as FTS5 query syntax"""
+        words = search_term.split()
+        return ' '.join('"' + word.replace('"', '""') + '"' for word in words)
+
     def get_statistics(self):
         """Get database statistics"""
         self.cursor.execute('SELECT COUNT(*) FROM pages')
@@ -140,6 +478,7 @@ class CrawlDatabase:
         }
 
     def close(self):
-        """Close database connection"""
+        """Commit pending writes and close database connection"""
+        self.conn.commit()
         self.conn.close()
         print("✓ Database closed")
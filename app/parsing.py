@@ -0,0 +1,185 @@
+"""
+Page parsing module.
+HTML decoding, text extraction and same-site link discovery used by the crawler.
+Functions are module-level and side-effect free, so parse_page can run in a
+worker process.
+"""
+
+from urllib3.exceptions import LocationParseError
+from urllib3.util import parse_url
+from selectolax.lexbor import LexborHTMLParser
+from urllib.parse import urljoin
+import functools
+import hashlib
+import re
+
+
+# Binary file extensions to skip
+EXCLUDED_EXT = ('.pdf', '.jpg', '.jpeg', '.png', '.gif', '.zip', '.rar',
+                '.doc', '.docx', '.xls', '.xlsx')
+
+# Same extensions as one case-insensitive regex, also matching before a query string
+EXCLUDED_EXT_RE = re.compile(
+    r'\.(?:%s)(?:$|\?)' % '|'.join(re.escape(ext[1:]) for ext in EXCLUDED_EXT),
+    re.IGNORECASE
+)
+
+# Whitespace normalization: collapse runs of spaces/tabs, and any whitespace
+# around line breaks (including blank lines) into a single newline
+_WS_RE = re.compile(r'[ \t]+')
+_NL_RE = re.compile(r'\s*\n\s*')
+
+
+def normalize_text(raw):
+    """Clean page text from extra whitespace (C-level regex passes, no Python loop)"""
+    return _NL_RE.sub('\n', _WS_RE.sub(' ', raw)).strip()
+
+
+# Page encoding: charset parameter of the Content-Type header, and the
+# <meta charset> / <meta http-equiv> declaration near the top of the document
+_HEADER_CHARSET_RE = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+_META_CHARSET_RE = re.compile(rb'<meta\b[^>]*?charset\s*=\s*["\']?\s*([\w.:-]+)', re.IGNORECASE)
+_META_SNIFF_BYTES = 4096
+
+
+def header_charset(content_type):
+    """Charset from a Content-Type header value, or None"""
+    match = _HEADER_CHARSET_RE.search(content_type or '')
+    return match.group(1) if match else None
+
+
+def decode_html(content, encoding=None):
+    """
+    Decode an HTML body (lexbor does not look at charset declarations itself).
+    Tries the HTTP charset, then a <meta charset> in the first few KB, then
+    UTF-8; undecodable bytes become U+FFFD.
+    """
+    meta = _META_CHARSET_RE.search(content, 0, _META_SNIFF_BYTES)
+    for candidate in (encoding, meta and meta.group(1).decode('ascii')):
+        if candidate:
+            try:
+                return content.decode(candidate, errors='replace')
+            except LookupError:
+                pass  # Unknown charset name
+    return content.decode('utf-8-sig', errors='replace')
+
+
+def url_id(url):
+    """
+    64-bit blake2b fingerprint of a URL, kept in the visited set instead of the URL
+    string (a small int instead of a ~100-byte str per page; collision chance
+    at 10M URLs is about 3e-6)
+    """
+    return int.from_bytes(hashlib.blake2b(url.encode(), digest_size=8).digest(), 'little')
+
+
+@functools.lru_cache(maxsize=4096)
+def cached_parse_url(url):
+    """
+    Memoized URL split (the same links repeat across many pages).
+    Uses urllib3's leaner parse_url; returns None for unparseable URLs.
+    """
+    try:
+        return parse_url(url)
+    except LocationParseError:
+        return None
+
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def site_origin(url):
+    """
+    Normalized scheme://host[:port] of a URL: lowercase, without a default port.
+    Returns None for unparseable URLs.
+    """
+    parsed = cached_parse_url(url)
+    if parsed is None or not parsed.host:
+        return None
+    scheme = (parsed.scheme or '').lower()
+    origin = f"{scheme}://{parsed.host.lower()}"
+    if parsed.port and parsed.port != _DEFAULT_PORTS.get(scheme):
+        origin += f":{parsed.port}"
+    return origin
+
+
+def is_crawlable_url(url, domain, domain_prefix):
+    """Check that an absolute URL is on the crawled site and not a binary file"""
+    # Same scheme and host as the start URL. Plain prefix test first (the trailing
+    # '/' keeps e.g. example.com.evil.net out); URLs that differ only in case or
+    # an explicit default port fall back to comparing normalized origins
+    if not (url.startswith(domain_prefix) or url == domain or site_origin(url) == domain):
+        return False
+
+    # Ignore binary files
+    if EXCLUDED_EXT_RE.search(url):
+        return False
+
+    return True
+
+
+@functools.lru_cache(maxsize=16384)
+def cached_urljoin(base, href):
+    """Memoized urljoin (navigation links repeat on every page of a site)"""
+    return urljoin(base, href)
+
+
+def extract_links(tree, current_url, domain):
+    """Extract same-site links from a parsed page (each link once, in page order)"""
+    domain_prefix = domain + '/'
+    links = {}
+    for node in tree.css('a[href]'):
+        # Remove fragments (#) before joining, so anchors of one page share a cache entry
+        href = (node.attributes.get('href') or '').strip().partition('#')[0]
+
+        # Convert relative links to absolute. Root-relative and absolute links resolve
+        # the same from every page, so they are joined against the site root and hit
+        # the cache across pages
+        base = domain if href.startswith(('/', 'http://', 'https://')) else current_url
+        full_url = cached_urljoin(base, href)
+
+        if full_url not in links and is_crawlable_url(full_url, domain, domain_prefix):
+            links[full_url] = None
+
+    return list(links)
+
+
+def parse_page(content, url, domain, preview_chars, encoding=None):
+    """
+    Parse an HTML page into the fields stored per result.
+    Module-level and side-effect free so it can run in a worker process.
+
+    Args:
+        content: Raw HTML bytes
+        url: Page URL (base for relative links)
+        domain: Crawled site (normalized scheme://host, see site_origin), links
+                elsewhere are dropped
+        preview_chars: Number of text characters to keep
+        encoding: Charset from the HTTP Content-Type header, if any
+
+    Returns:
+        Dictionary with keys: title, text, text_length, links, content_sha256
+    """
+    # Parse with lexbor (C parser, far fewer Python objects than a soup tree)
+    tree = LexborHTMLParser(decode_html(content, encoding))
+
+    # Extract text
+    # Remove script and style elements
+    tree.strip_tags(['script', 'style', 'noscript'])
+
+    title_node = tree.css_first('title')
+    title = title_node.text(strip=True) if title_node else ''
+    body = tree.body or tree.root
+    raw_text = body.text(separator='\n', strip=True) if body else ''
+    text = normalize_text(raw_text)
+
+    return {
+        'title': title,
+        # Only the first preview_chars characters are stored
+        'text': text[:preview_chars],
+        'text_length': len(text),
+        # Extract links for further crawling
+        'links': extract_links(tree, url, domain),
+        # Fingerprint of the full page text (unchanged pages are not stored again)
+        'content_sha256': hashlib.sha256(f"{title}\n{raw_text}".encode('utf-8')).hexdigest()
+    }
@@ -6,16 +6,21 @@ Uses ChromaDB with OpenAI embeddings API for AI-powered search.
 import chromadb
 from chromadb.config import Settings
 from openai import OpenAI
-from typing import List, Dict, Optional
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Dict, Optional
 import hashlib
 import os
+import tiktoken
 from dotenv import load_dotenv
 
+from .batch_api import BatchApiMixin
+
 # Load environment variables from .env file
 load_dotenv()
 
 
-class VectorStore:
+class VectorStore(BatchApiMixin):
     """
     Class for working with ChromaDB vector database.
     Enables semantic search using OpenAI embeddings API.
@@ -25,7 +30,13 @@ class VectorStore:
                  persist_directory: str = './chroma_db',
                  collection_name: str = 'crawled_pages',
                  embedding_model: str = 'text-embedding-3-small',
-                 api_key: Optional[str] = None):
+                 api_key: Optional[str] = None,
+                 embedding_dimensions: Optional[int] = None,
+                 store_documents: bool = True,
+                 embedding_cache=None,
+                 hnsw_m: Optional[int] = None,
+                 hnsw_ef_construction: Optional[int] = None,
+                 hnsw_ef_search: Optional[int] = None):
         """
         Initialize ChromaDB vector store with OpenAI embeddings.
 
@@ -36,13 +47,51 @@ class VectorStore:
                            Default: 'text-embedding-3-small' (1536-dim, $0.02/1M tokens)
                            Alternative: 'text-embedding-3-large' (3072-dim, $0.13/1M tokens, better quality)
             api_key: OpenAI API key (if not provided, will use OPENAI_API_KEY env variable)
+            embedding_dimensions: Shorten text-embedding-3 vectors to this many dimensions
+                                  (e.g. 512: 3x less index memory, faster search).
+                                  None keeps the model's full size. Changing it needs a
+                                  new collection, since stored vectors keep their size
+            store_documents: Keep page text in ChromaDB next to the vectors. Set to False
+                             when SQLite already stores the pages, so the text is not
+                             kept twice; search results then have empty 'content'
+                             (fill it from CrawlDatabase.get_page)
+            embedding_cache: Persistent store of embeddings across runs, e.g. a
+                             CrawlDatabase (get_cached_embeddings / save_embeddings).
+                             Unchanged pages are then never sent to the API again
+            hnsw_m: HNSW graph links per vector (Chroma default 16; 24-32 improves
+                    recall on 100k+ pages at the cost of memory)
+            hnsw_ef_construction: Candidate list size while building the index
+                                  (default 100). hnsw_m and hnsw_ef_construction
+                                  only apply when the collection is created
+            hnsw_ef_search: Candidate list size per query (default 100; higher is
+                            more accurate and slower). Also applied to existing
+                            collections. None keeps Chroma's defaults
         """
         self.persist_directory = persist_directory
         self.collection_name = collection_name
         self.embedding_model = embedding_model
+        self.embedding_dimensions = embedding_dimensions
+        self.store_documents = store_documents
+
+        # Extra arguments for every embeddings.create() call
+        self._embedding_args = {'encoding_format': 'float'}
+        if embedding_dimensions:
+            self._embedding_args['dimensions'] = embedding_dimensions
+
+        # LRU cache of embeddings keyed by text hash (repeated boilerplate/stub pages)
+        self._embedding_cache = OrderedDict()
+        self.persistent_cache = embedding_cache
+        # Results of Batch API jobs, consumed by the add_pages_batch() call that ran them
+        self._prefetched = {}
+        self._encoding = self._load_encoding(embedding_model)
 
         # Initialize OpenAI client
-        self.openai_client = OpenAI(api_key=api_key or os.getenv('OPENAI_API_KEY'))
+        # The client retries rate limits (429), 5xx and connection errors itself, with
+        # exponential backoff, jitter and the Retry-After header
+        self.openai_client = OpenAI(
+            api_key=api_key or os.getenv('OPENAI_API_KEY'),
+            max_retries=self.API_MAX_RETRIES
+        )
 
         # Verify API key is set
         if not self.openai_client.api_key:
@@ -51,29 +100,146 @@ class VectorStore:
                 "Get your API key at: https://platform.openai.com/api-keys"
             )
 
-        # Initialize ChromaDB client with persistent storage
-        self.client = chromadb.Client(Settings(
-            persist_directory=persist_directory,
-            anonymized_telemetry=False
-        ))
+        # Initialize ChromaDB client with persistent storage (chromadb.Client with a
+        # persist_directory setting keeps everything in memory since ChromaDB 0.4)
+        self.client = chromadb.PersistentClient(
+            path=persist_directory,
+            settings=Settings(anonymized_telemetry=False)
+        )
+
+        # Index settings of the collection (cosine similarity, optional HNSW tuning)
+        self._collection_metadata = {"hnsw:space": "cosine"}
+        for key, value in (("hnsw:M", hnsw_m),
+                           ("hnsw:construction_ef", hnsw_ef_construction),
+                           ("hnsw:search_ef", hnsw_ef_search)):
+            if value:
+                self._collection_metadata[key] = value
 
         # Get or create collection
         self.collection = self.client.get_or_create_collection(
             name=collection_name,
-            metadata={"hnsw:space": "cosine"}  # Use cosine similarity
+            metadata=self._collection_metadata
         )
+        if hnsw_ef_search:
+            self._set_ef_search(hnsw_ef_search)
 
         print(f"✓ Vector store initialized: {persist_directory}")
-        print(f"✓ Using OpenAI model: {embedding_model}")
+        if embedding_dimensions:
+            print(f"✓ Using OpenAI model: {embedding_model} ({embedding_dimensions} dimensions)")
+        else:
+            print(f"✓ Using OpenAI model: {embedding_model}")
         print(f"✓ Collection: {collection_name} (Documents: {self.collection.count()})")
 
+    def _set_ef_search(self, ef_search: int):
+        """Apply the query-time candidate list size to an existing collection"""
+        try:
+            current = (self.collection.configuration or {}).get('hnsw') or {}
+            if current.get('ef_search') != ef_search:
+                self.collection.modify(configuration={'hnsw': {'ef_search': ef_search}})
+        except Exception as e:
+            print(f"⚠️  Could not change ef_search of existing collection: {e}")
+
     def _generate_id(self, url: str) -> str:
-        """Generate unique ID from URL using hash"""
-        return hashlib.md5(url.encode()).hexdigest()
+        """Generate unique ID from URL using hash (128-bit blake2b, 32 hex chars)"""
+        return hashlib.blake2b(url.encode(), digest_size=16).hexdigest()
+
+    # Retries per OpenAI request (the client default of 2 gives up within ~1.5s of a
+    # rate limit; 6 backs off for ~25s, longer when Retry-After asks for it)
+    API_MAX_RETRIES = 6
+
+    # OpenAI accepts arrays of inputs; keep each request well under the per-request limits
+    # (2048 inputs and 300k tokens)
+    EMBEDDING_BATCH_SIZE = 512
+    MAX_TOKENS_PER_REQUEST = 250000
+
+    # Per-input limit of the embedding models is 8191 tokens; keep a small margin
+    MAX_INPUT_TOKENS = 8000
+
+    # Parallel embedding requests per _embed_batch() call. Request latency grows with the
+    # number of tokens sent, so a chunk is spread over up to this many requests at once
+    EMBEDDING_CONCURRENCY = 4
+
+    # Number of embeddings kept in the in-process cache
+    EMBEDDING_CACHE_SIZE = 4096
+
+    @staticmethod
+    def _load_encoding(model: str):
+        """Get the model's tokenizer (None if tiktoken can't load it, e.g. offline)"""
+        try:
+            try:
+                return tiktoken.encoding_for_model(model)
+            except KeyError:
+                return tiktoken.get_encoding('cl100k_base')
+        except Exception as e:
+            print(f"⚠️  Tokenizer unavailable ({type(e).__name__}), estimating token counts")
+            return None
+
+    def _count_tokens(self, text: str) -> int:
+        """Number of tokens in text (conservative estimate without a tokenizer)"""
+        if self._encoding is None:
+            return len(text) // 3 + 1
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+    def _request_batches(self, keys: List[str], texts: Dict[str, str], batch_size: int):
+        """Split keys into API requests of at most batch_size inputs and MAX_TOKENS_PER_REQUEST tokens"""
+        batch = []
+        batch_tokens = 0
+        for key in keys:
+            tokens = self._count_tokens(texts[key])
+            if batch and (len(batch) >= batch_size
+                          or batch_tokens + tokens > self.MAX_TOKENS_PER_REQUEST):
+                yield batch
+                batch = []
+                batch_tokens = 0
+            batch.append(key)
+            batch_tokens += tokens
+        if batch:
+            yield batch
+
+    def _truncate(self, text: str) -> str:
+        """Truncate very long texts to fit the embedding model's token limit"""
+        # A token covers at least one UTF-8 byte (at most 4 per char), so shorter
+        # texts can't exceed the limit and are not tokenized here
+        if len(text) <= self.MAX_INPUT_TOKENS // 4:
+            return text
+
+        if self._encoding is None:
+            # No tokenizer: roughly 4 chars = 1 token for English text
+            max_chars = 30000
+            if len(text) > max_chars:
+                text = text[:max_chars] + "..."
+            return text
+
+        tokens = self._encoding.encode(text, disallowed_special=())
+        if len(tokens) <= self.MAX_INPUT_TOKENS:
+            return text
+        return self._encoding.decode(tokens[:self.MAX_INPUT_TOKENS])
+
+    def _text_key(self, text: str) -> str:
+        """Cache key for a (truncated) text; includes the model so cached vectors never mix"""
+        prefix = f"{self.embedding_model}:{self.embedding_dimensions or ''}:"
+        return hashlib.sha256((prefix + text).encode('utf-8')).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[List[float]]:
+        """Return a cached embedding and mark it as recently used"""
+        embedding = self._embedding_cache.get(key)
+        if embedding is None:
+            return None
+        self._embedding_cache.move_to_end(key)
+        return list(embedding)
+
+    def _cache_put(self, key: str, embedding: List[float]):
+        """Cache an embedding (stored as an immutable tuple), evicting the oldest"""
+        self._embedding_cache[key] = tuple(embedding)
+        self._embedding_cache.move_to_end(key)
+        if len(self._embedding_cache) > self.EMBEDDING_CACHE_SIZE:
+            self._embedding_cache.popitem(last=False)
 
     def _create_embedding(self, text: str) -> List[float]:
         """
         Create embedding using OpenAI API.
+        Goes through the same caches as _embed_batch(), so repeated search queries
+        are answered from memory or from the persistent cache of earlier runs.
 
         Args:
             text: Text to embed
@@ -82,24 +248,80 @@ class VectorStore:
             Embedding vector (list of floats)
         """
         try:
-            # Truncate very long texts (OpenAI has 8191 token limit for text-embedding-3-small)
-            # Roughly 4 chars = 1 token, so ~32000 chars max
-            max_chars = 30000
-            if len(text) > max_chars:
-                text = text[:max_chars] + "..."
-
-            response = self.openai_client.embeddings.create(
-                model=self.embedding_model,
-                input=text,
-                encoding_format="float"
-            )
-
-            return response.data[0].embedding
+            return self._embed_batch([text])[0]
 
         except Exception as e:
             print(f"OpenAI embedding error: {e}")
             raise
 
+    def _request_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts with one API request (runs in _embed_batch worker threads)"""
+        response = self.openai_client.embeddings.create(
+            model=self.embedding_model,
+            input=texts,
+            **self._embedding_args
+        )
+        # Results carry their input index; sort to be safe about ordering
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+    def _embed_batch(self, texts: List[str], batch_size: int = EMBEDDING_BATCH_SIZE) -> List[List[float]]:
+        """
+        Create embeddings for many texts, spread over up to EMBEDDING_CONCURRENCY
+        parallel OpenAI requests of at most batch_size texts and
+        MAX_TOKENS_PER_REQUEST tokens each. Cached and repeated texts are only sent once.
+
+        Args:
+            texts: Texts to embed
+            batch_size: Maximum number of inputs per API request
+
+        Returns:
+            Embedding vectors in the same order as texts
+        """
+        texts = [self._truncate(text) for text in texts]
+        keys = [self._text_key(text) for text in texts]
+
+        found = {}
+        misses = {}  # key -> text, unique texts not in the cache
+        for key, text in zip(keys, texts):
+            if key in found or key in misses:
+                continue
+            cached = self._cache_get(key)
+            if cached is None:
+                cached = self._prefetched.get(key)
+            if cached is not None:
+                found[key] = cached
+            else:
+                misses[key] = text
+
+        # Vectors stored by earlier runs
+        if misses and self.persistent_cache is not None:
+            for key, embedding in self.persistent_cache.get_cached_embeddings(list(misses)).items():
+                found[key] = embedding
+                self._cache_put(key, embedding)
+                del misses[key]
+
+        if misses:
+            per_request = min(batch_size, -(-len(misses) // self.EMBEDDING_CONCURRENCY))
+            # Group texts of similar length into the same request, so short pages don't
+            # wait on a request padded to the longest page (order is restored via keys)
+            by_length = sorted(misses, key=lambda key: len(misses[key]))
+            requests = list(self._request_batches(by_length, misses, per_request))
+            with ThreadPoolExecutor(max_workers=min(self.EMBEDDING_CONCURRENCY, len(requests))) as pool:
+                responses = pool.map(self._request_embeddings,
+                                     [[misses[key] for key in chunk_keys] for chunk_keys in requests])
+                # Results arrive in request order; the database is only used from this thread
+                for chunk_keys, embeddings in zip(requests, responses):
+                    for key, embedding in zip(chunk_keys, embeddings):
+                        found[key] = embedding
+                        self._cache_put(key, embedding)
+
+                    if self.persistent_cache is not None:
+                        self.persistent_cache.save_embeddings(
+                            {key: found[key] for key in chunk_keys}
+                        )
+
+        return [found[key] for key in keys]
+
     def add_page(self, url: str, title: str, content: str, metadata: Optional[Dict] = None):
         """
         Add page to vector database with embeddings.
@@ -129,11 +351,11 @@ class VectorStore:
             # Create embedding using OpenAI API
             embedding = self._create_embedding(document_text)
 
-            # Add to ChromaDB
-            self.collection.add(
+            # Add to ChromaDB (replaces the stored version of a re-crawled page)
+            self.collection.upsert(
                 ids=[doc_id],
                 embeddings=[embedding],
-                documents=[content],  # Store full content
+                documents=[content] if self.store_documents else None,  # Store full content
                 metadatas=[page_metadata]
             )
 
@@ -143,33 +365,82 @@ class VectorStore:
             print(f"Vector store add error: {e}")
             return False
 
-    def add_pages_batch(self, pages: List[Dict]):
+    def add_pages_batch(self, pages: Iterable[Dict], batch_size: int = 100,
+                        use_batch_api: bool = False, poll_interval: int = 60):
         """
         Add multiple pages at once (more efficient).
+        Pages are written to ChromaDB in chunks of batch_size, one collection.upsert()
+        call per chunk, so large crawls don't pay one insert per page or hold
+        every embedding in memory at once.
 
         Args:
-            pages: List of page dictionaries with keys: url, title, content, metadata
+            pages: Iterable of page dictionaries with keys: url, title, content, metadata
+            batch_size: Number of pages per ChromaDB insert (50-250 works well; capped
+                        at the client's maximum batch size)
+            use_batch_api: Embed all pages first with the OpenAI Batch API (half the
+                           price, separate rate limits, but results can take up to
+                           24 hours). Pages it could not embed use regular requests
+            poll_interval: Seconds between Batch API job status checks
         """
-        if not pages:
+        # Larger inserts are rejected by ChromaDB as a whole
+        batch_size = max(1, min(batch_size, self.client.get_max_batch_size()))
+
+        total = len(pages) if hasattr(pages, '__len__') else None
+        if total == 0:
             return
 
+        if total:
+            print(f"Generating embeddings for {total} pages using OpenAI API...")
+        else:
+            print("Generating embeddings using OpenAI API...")
+
+        if use_batch_api:
+            pages = list(pages)
+            self._prefetch_with_batch_api([self._page_text(page) for page in pages], poll_interval)
+
+        added = 0
+        position = 0
+        batch = []
+        for page in pages:
+            batch.append(page)
+            if len(batch) >= batch_size:
+                added += self._add_batch(batch, position, total)
+                position += len(batch)
+                batch = []
+
+        if batch:
+            added += self._add_batch(batch, position, total)
+
+        self._prefetched = {}
+
+        if added:
+            print(f"✓ Added {added} pages to vector store")
+
+    @staticmethod
+    def _page_text(page: Dict) -> str:
+        """Text embedded for a page: title and content"""
+        return f"{page.get('title', '')}\n\n{page.get('content', '')}"
+
+    def _add_batch(self, pages: List[Dict], position: int, total: Optional[int]) -> int:
+        """
+        Embed one chunk of pages and insert it with a single collection.upsert() call.
+
+        Returns:
+            Number of pages added
+        """
         try:
             ids = []
-            embeddings = []
             documents = []
             metadatas = []
+            texts = []
+            total_label = total or '?'
 
-            print(f"Generating embeddings for {len(pages)} pages using OpenAI API...")
-
-            for i, page in enumerate(pages, 1):
+            for page in pages:
                 url = page['url']
                 title = page.get('title', '')
                 content = page.get('content', '')
                 metadata = page.get('metadata', {})
 
-                # Create document text
-                document_text = f"{title}\n\n{content}"
-
                 # Prepare metadata
                 page_metadata = {
                     'url': url,
@@ -178,34 +449,56 @@ class VectorStore:
                 }
                 page_metadata.update(metadata)
 
-                # Generate embedding
-                try:
-                    embedding = self._create_embedding(document_text)
-
-                    ids.append(self._generate_id(url))
-                    embeddings.append(embedding)
-                    documents.append(content)
-                    metadatas.append(page_metadata)
-
-                    print(f"  [{i}/{len(pages)}] Embedded: {title[:50]}...")
-
-                except Exception as e:
-                    print(f"  [{i}/{len(pages)}] Failed to embed {url}: {e}")
-                    continue
+                ids.append(self._generate_id(url))
+                documents.append(content)
+                metadatas.append(page_metadata)
+                texts.append(self._page_text(page))
+
+            # Generate embeddings for the whole chunk in as few requests as possible
+            try:
+                embeddings = self._embed_batch(texts)
+                print(f"  [{position + len(ids)}/{total_label}] Embedded {len(ids)} pages")
+            except Exception as e:
+                print(f"  ⚠️  Batch embedding failed ({e}), retrying page by page...")
+                ids, embeddings, documents, metadatas = self._embed_one_by_one(
+                    ids, texts, documents, metadatas, position, total_label
+                )
 
-            # Batch add to ChromaDB
+            # Batch add to ChromaDB (upsert: changed pages from a re-crawl replace
+            # their stored vectors instead of being ignored as existing ids)
             if ids:
-                self.collection.add(
+                self.collection.upsert(
                     ids=ids,
                     embeddings=embeddings,
-                    documents=documents,
+                    documents=documents if self.store_documents else None,
                     metadatas=metadatas
                 )
 
-                print(f"✓ Added {len(ids)} pages to vector store")
+            return len(ids)
 
         except Exception as e:
             print(f"Batch add error: {e}")
+            return 0
+
+    def _embed_one_by_one(self, ids, texts, documents, metadatas, position, total_label):
+        """
+        Fallback for a failed batch request: embed pages individually and
+        drop only the ones that still fail.
+
+        Returns:
+            Tuple of (ids, embeddings, documents, metadatas) for embedded pages
+        """
+        kept = ([], [], [], [])
+        for i, (doc_id, text, document, metadata) in enumerate(
+                zip(ids, texts, documents, metadatas), position + 1):
+            try:
+                embedding = self._create_embedding(text)
+            except Exception as e:
+                print(f"  [{i}/{total_label}] Failed to embed {metadata['url']}: {e}")
+                continue
+            for column, value in zip(kept, (doc_id, embedding, document, metadata)):
+                column.append(value)
+        return kept
 
     def semantic_search(self, query: str, top_k: int = 5, filter_metadata: Optional[Dict] = None) -> List[Dict]:
         """
@@ -236,7 +529,7 @@ class VectorStore:
                 for i in range(len(results['ids'][0])):
                     result = {
                         'id': results['ids'][0][i],
-                        'content': results['documents'][0][i],
+                        'content': results['documents'][0][i] or '',
                         'distance': results['distances'][0][i],
                         'metadata': results['metadatas'][0][i]
                     }
@@ -248,6 +541,22 @@ class VectorStore:
             print(f"Search error: {e}")
             return []
 
+    def missing_pages(self, urls: List[str]) -> set:
+        """
+        Find pages that are not in the collection yet
+
+        Args:
+            urls: Page URLs to check
+
+        Returns:
+            Set of URLs without a stored vector
+        """
+        ids = {self._generate_id(url): url for url in urls}
+        if not ids:
+            return set()
+        stored = self.collection.get(ids=list(ids), include=[])['ids']
+        return set(ids.values()) - {ids[doc_id] for doc_id in stored}
+
     def delete_page(self, url: str):
         """Delete page from vector store by URL"""
         try:
@@ -264,7 +573,7 @@ class VectorStore:
             self.client.delete_collection(self.collection_name)
             self.collection = self.client.create_collection(
                 name=self.collection_name,
-                metadata={"hnsw:space": "cosine"}
+                metadata=self._collection_metadata
             )
             print("✓ Vector store cleared")
             return True
@@ -278,5 +587,6 @@ class VectorStore:
             'total_documents': self.collection.count(),
             'collection_name': self.collection_name,
             'persist_directory': self.persist_directory,
-            'embedding_model': self.embedding_model
+            'embedding_model': self.embedding_model,
+            'embedding_dimensions': self.embedding_dimensions
         }
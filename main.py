@@ -3,8 +3,49 @@ Main entry point for web crawler application.
 Orchestrates crawler, database, and configuration.
 """
 
+from itertools import islice
+
 from app import WebCrawler, CrawlDatabase, VectorStore, config
 
+# Pages written to SQLite per transaction
+DB_BATCH_SIZE = 500
+
+
+def pages_for_vector_store(vector_store, db):
+    """
+    Yield pages to embed from OUTPUT_FILE: changed pages, plus unchanged pages
+    (304 / same text hash) that the collection does not hold yet, e.g. after
+    switching to a new collection or a run that failed while embedding
+    """
+    results = WebCrawler.load_results(config.OUTPUT_FILE)
+    while True:
+        chunk = list(islice(results, DB_BATCH_SIZE))
+        if not chunk:
+            return
+
+        unchanged = [result['url'] for result in chunk if result.get('unchanged')]
+        missing = vector_store.missing_pages(unchanged)
+        # 304 records carry no text; read it from SQLite
+        need_text = [result['url'] for result in chunk
+                     if result['url'] in missing and result['text'] is None]
+        stored = db.get_pages(need_text) if db else {}
+
+        for result in chunk:
+            text = result['text']
+            if result.get('unchanged'):
+                if result['url'] not in missing:
+                    continue
+                if text is None:
+                    page = stored.get(result['url'])
+                    if not page:
+                        continue
+                    text = page['content'] or ''
+            yield {
+                'url': result['url'],
+                'title': result['title'],
+                'content': text
+            }
+
 
 def main():
     """Main function to run the web crawler"""
@@ -13,36 +54,61 @@ def main():
     print("=" * 80)
     print()
 
+    # Optionally: Save to SQLite database (set DATABASE_ENABLED=true in .env)
+    db = CrawlDatabase(config.DATABASE_PATH) if config.DATABASE_ENABLED else None
+
+    # Pages stored by earlier runs are revalidated with conditional GET
+    known_pages = db.get_crawl_state() if db and config.INCREMENTAL_CRAWL else None
+
     # Create and run crawler
     crawler = WebCrawler(
         base_url=config.BASE_URL,
         max_pages=config.MAX_PAGES,
         delay=config.DELAY,
         stealth_mode=config.STEALTH_MODE,
-        auth=config.AUTH_CONFIG
+        auth=config.AUTH_CONFIG,
+        max_workers=config.MAX_WORKERS,
+        parse_workers=config.PARSE_WORKERS,
+        output_file=config.OUTPUT_FILE,
+        max_page_bytes=config.MAX_PAGE_BYTES,
+        known_pages=known_pages
     )
 
-    # Start crawling
-    results = crawler.crawl()
-
-    # Save results to JSON
-    crawler.save_results(config.OUTPUT_FILE)
-
-    # Optionally: Save to database
-    # Uncomment the lines below to also save to SQLite database
-    # db = CrawlDatabase(config.DATABASE_PATH)
-    # for result in results:
-    #     db.save_page(
-    #         url=result['url'],
-    #         title=result['title'],
-    #         content=result['text'],
-    #         links_count=0
-    #     )
-    # stats = db.get_statistics()
-    # print(f"\nDatabase statistics:")
-    # print(f"  Total pages: {stats['total_pages']}")
-    # print(f"  Total characters: {stats['total_characters']}")
-    # db.close()
+    # Start crawling (results are streamed to OUTPUT_FILE as NDJSON)
+    crawler.crawl()
+
+    # Flush and close the results file
+    crawler.save_results()
+
+    # Unchanged pages (304 or same content hash) are flagged in OUTPUT_FILE: they are not
+    # saved to SQLite again, and only embedded if the vector store does not have them
+    if db:
+        # Group inserts so each transaction (and fsync) covers many pages
+        batch = []
+        for result in WebCrawler.load_results(config.OUTPUT_FILE):
+            if result.get('unchanged'):
+                continue
+            batch.append({
+                'url': result['url'],
+                'title': result['title'],
+                'content': result['text'],
+                'text_length': result['text_length'],
+                'links_count': len(result.get('links', [])),
+                'etag': result.get('etag'),
+                'last_modified': result.get('last_modified'),
+                'links': result.get('links'),
+                'content_sha256': result.get('content_sha256')
+            })
+            if len(batch) >= DB_BATCH_SIZE:
+                db.save_pages_batch(batch)
+                batch = []
+        db.save_pages_batch(batch)
+        db.update_validators(crawler.refreshed_validators)
+
+        stats = db.get_statistics()
+        print(f"\nDatabase statistics:")
+        print(f"  Total pages: {stats['total_pages']}")
+        print(f"  Total characters: {stats['total_characters']}")
 
     # Save to ChromaDB vector store for semantic search
     if config.VECTOR_STORE_ENABLED:
@@ -53,20 +119,23 @@ def main():
         vector_store = VectorStore(
             persist_directory=config.VECTOR_STORE_PATH,
             collection_name=config.VECTOR_COLLECTION_NAME,
-            embedding_model=config.OPENAI_EMBEDDING_MODEL
+            embedding_model=config.OPENAI_EMBEDDING_MODEL,
+            embedding_dimensions=config.OPENAI_EMBEDDING_DIMENSIONS or None,
+            hnsw_m=config.HNSW_M or None,
+            hnsw_ef_construction=config.HNSW_EF_CONSTRUCTION or None,
+            hnsw_ef_search=config.HNSW_EF_SEARCH or None,
+            store_documents=config.VECTOR_STORE_DOCUMENTS,
+            embedding_cache=db  # Reuse embeddings stored by earlier runs
         )
 
-        # Convert results to format for batch insertion
-        pages_to_add = [
-            {
-                'url': result['url'],
-                'title': result['title'],
-                'content': result['text']
-            }
-            for result in results
-        ]
+        # Pages to embed, read lazily and inserted in chunks
+        pages_to_add = pages_for_vector_store(vector_store, db)
 
-        vector_store.add_pages_batch(pages_to_add)
+        vector_store.add_pages_batch(
+            pages_to_add,
+            use_batch_api=config.OPENAI_BATCH_API,
+            poll_interval=config.OPENAI_BATCH_POLL_INTERVAL
+        )
 
         vs_stats = vector_store.get_statistics()
         print(f"\nVector store statistics:")
@@ -75,9 +144,12 @@ def main():
         print(f"  Path: {vs_stats['persist_directory']}")
         print("\n✓ Use 'python search.py' for semantic search")
 
+    if db:
+        db.close()
+
     # Display sample results
     print("\nSample crawled pages:")
-    for i, result in enumerate(results[:5], 1):
+    for i, result in enumerate(islice(WebCrawler.load_results(config.OUTPUT_FILE), 5), 1):
         print(f"{i}. {result['title']} - {result['url']}")
 
     print()
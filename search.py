@@ -3,10 +3,30 @@ Semantic search script using ChromaDB vector store.
 Demonstrates AI-powered search capabilities with natural language queries.
 """
 
-from app import VectorStore, config
+from app import CrawlDatabase, VectorStore, config
 import sys
 
 
+def open_page_database():
+    """Open SQLite for stored query embeddings and for result previews"""
+    if not config.DATABASE_ENABLED:
+        return None
+    return CrawlDatabase(config.DATABASE_PATH)
+
+
+def fill_content(results, db):
+    """Load page text of search results from SQLite when it is not kept in ChromaDB"""
+    if not db or config.VECTOR_STORE_DOCUMENTS:
+        return results
+    missing = [result for result in results if not result['content']]
+    pages = db.get_pages([result['metadata'].get('url') for result in missing])
+    for result in missing:
+        page = pages.get(result['metadata'].get('url'))
+        if page:
+            result['content'] = page['content'] or ''
+    return results
+
+
 def print_search_results(results, query):
     """Pretty print search results"""
     print(f"\n{'=' * 80}")
@@ -36,63 +56,85 @@ def interactive_search():
     print("=" * 80)
     print("\nLoading vector store...")
 
-    # Initialize vector store
-    vector_store = VectorStore(
-        persist_directory=config.VECTOR_STORE_PATH,
-        collection_name=config.VECTOR_COLLECTION_NAME,
-        embedding_model=config.OPENAI_EMBEDDING_MODEL
-    )
-
-    stats = vector_store.get_statistics()
-    print(f"\n✓ Vector store loaded")
-    print(f"  Documents available: {stats['total_documents']}")
-
-    if stats['total_documents'] == 0:
-        print("\n❌ No documents in vector store!")
-        print("   Run 'python main.py' first to crawl and index pages.\n")
-        return
-
-    print("\n" + "=" * 80)
-    print("Enter your search queries (natural language)")
-    print("Examples:")
-    print("  - find all about security")
-    print("  - security best practices")
-    print("  - how to configure authentication")
-    print("\nType 'quit' or 'exit' to stop")
-    print("=" * 80)
-
-    while True:
-        try:
-            query = input("\n🔍 Search query: ").strip()
-
-            if query.lower() in ['quit', 'exit', 'q']:
-                print("\n👋 Goodbye!\n")
+    # Initialize vector store (query embeddings are kept in SQLite across sessions)
+    db = open_page_database()
+    try:
+        vector_store = VectorStore(
+            persist_directory=config.VECTOR_STORE_PATH,
+            collection_name=config.VECTOR_COLLECTION_NAME,
+            embedding_model=config.OPENAI_EMBEDDING_MODEL,
+            embedding_dimensions=config.OPENAI_EMBEDDING_DIMENSIONS or None,
+            hnsw_m=config.HNSW_M or None,
+            hnsw_ef_construction=config.HNSW_EF_CONSTRUCTION or None,
+            hnsw_ef_search=config.HNSW_EF_SEARCH or None,
+            store_documents=config.VECTOR_STORE_DOCUMENTS,
+            embedding_cache=db
+        )
+
+        stats = vector_store.get_statistics()
+        print(f"\n✓ Vector store loaded")
+        print(f"  Documents available: {stats['total_documents']}")
+
+        if stats['total_documents'] == 0:
+            print("\n❌ No documents in vector store!")
+            print("   Run 'python main.py' first to crawl and index pages.\n")
+            return
+
+        print("\n" + "=" * 80)
+        print("Enter your search queries (natural language)")
+        print("Examples:")
+        print("  - find all about security")
+        print("  - security best practices")
+        print("  - how to configure authentication")
+        print("\nType 'quit' or 'exit' to stop")
+        print("=" * 80)
+
+        while True:
+            try:
+                query = input("\n🔍 Search query: ").strip()
+
+                if query.lower() in ['quit', 'exit', 'q']:
+                    print("\n👋 Goodbye!\n")
+                    break
+
+                if not query:
+                    continue
+
+                # Perform semantic search
+                results = fill_content(vector_store.semantic_search(query, top_k=5), db)
+                print_search_results(results, query)
+
+            except KeyboardInterrupt:
+                print("\n\n👋 Goodbye!\n")
                 break
-
-            if not query:
-                continue
-
-            # Perform semantic search
-            results = vector_store.semantic_search(query, top_k=5)
-            print_search_results(results, query)
-
-        except KeyboardInterrupt:
-            print("\n\n👋 Goodbye!\n")
-            break
-        except Exception as e:
-            print(f"\n❌ Search error: {e}\n")
+            except Exception as e:
+                print(f"\n❌ Search error: {e}\n")
+    finally:
+        if db:
+            db.close()
 
 
 def single_query_search(query, top_k=5):
     """Search with a single query (for command-line usage)"""
-    vector_store = VectorStore(
-        persist_directory=config.VECTOR_STORE_PATH,
-        collection_name=config.VECTOR_COLLECTION_NAME,
-        embedding_model=config.OPENAI_EMBEDDING_MODEL
-    )
-
-    results = vector_store.semantic_search(query, top_k=top_k)
-    print_search_results(results, query)
+    db = open_page_database()
+    try:
+        vector_store = VectorStore(
+            persist_directory=config.VECTOR_STORE_PATH,
+            collection_name=config.VECTOR_COLLECTION_NAME,
+            embedding_model=config.OPENAI_EMBEDDING_MODEL,
+            embedding_dimensions=config.OPENAI_EMBEDDING_DIMENSIONS or None,
+            hnsw_m=config.HNSW_M or None,
+            hnsw_ef_construction=config.HNSW_EF_CONSTRUCTION or None,
+            hnsw_ef_search=config.HNSW_EF_SEARCH or None,
+            store_documents=config.VECTOR_STORE_DOCUMENTS,
+            embedding_cache=db
+        )
+
+        results = fill_content(vector_store.semantic_search(query, top_k=top_k), db)
+        print_search_results(results, query)
+    finally:
+        if db:
+            db.close()
 
 
 def main():